@@ -11,7 +11,10 @@ or dtypes for those structs.  They should be added manually in the template file
 """
 
 import re
+import mmap
 import os.path
+import hashlib
+import functools
 from collections import OrderedDict
 
 DEFAULT_ERFA_LOC = os.path.join(os.path.split(__file__)[0], 'liberfa/erfa/src')
@@ -22,17 +25,68 @@ NDIMS_REX = re.compile(re.escape("numpy.dtype([('fi0', '.*', <(.*)>)])")
                        .replace(r'\<', '(')
                        .replace(r'\>', ')'))
 
+# Sections of the ERFA function documentation, and of arguments within them.
+# Input/output sections start with "Given", "Given and returned" or "Returned".
+DOC_SECTION_REX = re.compile("(Given|Returned)([^\n]*):.*?\n(.+?)  \n", re.DOTALL)
+RETURN_VALUE_REX = re.compile("Returned \\(function value\\)([^\n]*):\n(.+?)  \n",
+                              re.DOTALL)
+ARGUMENT_DOC_REX = re.compile("^ +([^ ]+)[ ]+([^ ]+)[ ]+(.+)")
+# Arguments in a C function definition, and the parts of a single one
+# (ctype, pointer, name, array dimensions, and final [] for a pointer).
+ARGUMENTS_REX = re.compile(r"\(([^)]+)\)")
+ARGUMENT_REX = re.compile(r"(.+) (\*?)([^\s\[]+)((?:\[\d+\])*)(\[\])?$")
+# Sections and function declarations in erfa.h, and constants in erfam.h.
+SECTION_REX = re.compile(r'/\* (\w*)/(\w*) \*/\n(.*?)\n\n',
+                         re.DOTALL | re.MULTILINE)
+FUNCTION_NAME_REX = re.compile(r' (\w+)\(.*?\);', re.DOTALL)
+DECLARATION_REX = re.compile(r'^([^\s(][^(\n]*?\b(\w+)) ?\(', re.MULTILINE)
+CONSTANT_REX = re.compile(r"#define (ERFA_\w+?) (.+?)$", re.DOTALL | re.MULTILINE)
+CONSTANT_DOC_REX = re.compile(r"/\* (.+?) \*/\n", re.DOTALL)
+# Test functions in t_erfa_c.c: capture everything between a line starting
+# with '{' after the test function definition and the first line starting
+# with '}' or ' }'.
+TEST_FUNCTION_REX = re.compile(r"\nstatic void t_(\w+)\(.+?(^\{.+?^\s?\})",
+                               re.DOTALL | re.MULTILINE)
+
+# Sets of inout states for the "|"-separated filters used in args_by_inout.
+INOUT_FILTER_SETS = {}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_argument_definition(definition):
+    """Parse a C argument definition such as "double pv[2][3]".
+
+    Returns
+    -------
+    ctype, name, shape, is_ptr : str, str, tuple of int, bool
+
+    Parsed definitions are cached, since the same definitions occur for
+    many functions.
+    """
+    match = ARGUMENT_REX.match(definition.strip())
+    if match is None:
+        raise ValueError(f"Could not parse argument definition '{definition}'.")
+    ctype, ptr, name, dims, ptr_arr = match.groups()
+    shape = tuple([int(size) for size in dims[1:-1].split("][")]) if dims else ()
+    return ctype, name, shape, bool(ptr or ptr_arr)
+
 
 class FunctionDoc:
 
+    __slots__ = ('doc', '_input', '_output', '_input_names', '_output_names',
+                 '_ret_info')
+
     def __init__(self, doc):
         self.doc = doc.replace("**", "      ").replace("/*\n", "").replace("*/", "")
         self.doc = self.doc.replace("/*+\n", "")        # accommodate eraLdn
         self.doc = self.doc.replace("*  ", "    " * 2)  # accommodate eraAticqn
         self.doc = self.doc.replace("*\n", "\n")        # accommodate eraAticqn
-        self.__input = None
-        self.__output = None
-        self.__ret_info = None
+        self._input, self._output = self._parse_arg_docs()
+        self._input_names = frozenset().union(
+            *[arg_doc.name_set for arg_doc in self._input])
+        self._output_names = frozenset().union(
+            *[arg_doc.name_set for arg_doc in self._output])
+        self._ret_info = None
 
     def _get_arg_doc_list(self, doc_lines):
         """Parse input/output doc section lines, getting arguments from them.
@@ -74,50 +128,61 @@ class FunctionDoc:
 
         return doc_list
 
+    def _parse_arg_docs(self):
+        """Get input and output argument docs, in a single pass over the doc.
+
+        Inputs are taken from the first "Given" and "Given and returned"
+        sections, and outputs from the first "Given and returned" and
+        "Returned" sections.
+        """
+        sections = {}
+        for result in DOC_SECTION_REX.finditer(self.doc):
+            kind = result.group(1)
+            if kind == 'Given' and result.group(2).startswith(' and returned'):
+                kind = 'Given and returned'
+            if kind not in sections:
+                doc_lines = result.group(3).split("\n")
+                sections[kind] = self._get_arg_doc_list(doc_lines)
+
+        given_and_returned = sections.get('Given and returned', [])
+        return (sections.get('Given', []) + given_and_returned,
+                given_and_returned + sections.get('Returned', []))
+
     @property
     def input(self):
-        if self.__input is None:
-            self.__input = []
-            for regex in ("Given([^\n]*):.*?\n(.+?)  \n",
-                          "Given and returned([^\n]*):\n(.+?)  \n"):
-                result = re.search(regex, self.doc, re.DOTALL)
-                if result is not None:
-                    doc_lines = result.group(2).split("\n")
-                    self.__input += self._get_arg_doc_list(doc_lines)
-
-        return self.__input
+        return self._input
 
     @property
     def output(self):
-        if self.__output is None:
-            self.__output = []
-            for regex in ("Given and returned([^\n]*):\n(.+?)  \n",
-                          "Returned([^\n]*):.*?\n(.+?)  \n"):
-                result = re.search(regex, self.doc, re.DOTALL)
-                if result is not None:
-                    doc_lines = result.group(2).split("\n")
-                    self.__output += self._get_arg_doc_list(doc_lines)
+        return self._output
+
+    @property
+    def input_names(self):
+        """Names of all input arguments (for fast membership tests)."""
+        return self._input_names
 
-        return self.__output
+    @property
+    def output_names(self):
+        """Names of all output arguments (for fast membership tests)."""
+        return self._output_names
 
     @property
     def ret_info(self):
-        if self.__ret_info is None:
+        if self._ret_info is None:
             ret_info = []
-            result = re.search("Returned \\(function value\\)([^\n]*):\n(.+?)  \n",
-                               self.doc, re.DOTALL)
+            result = RETURN_VALUE_REX.search(self.doc)
             if result is not None:
                 ret_info.append(ReturnDoc(result.group(2)))
 
             if len(ret_info) == 0:
-                self.__ret_info = ''
+                self._ret_info = ''
             elif len(ret_info) == 1:
-                self.__ret_info = ret_info[0]
+                self._ret_info = ret_info[0]
             else:
                 raise ValueError("Multiple C return sections found in this doc:\n"
                                  + self.doc)
 
-        return self.__ret_info
+        return self._ret_info
 
     @property
     def title(self):
@@ -144,18 +209,23 @@ class FunctionDoc:
 
 class ArgumentDoc:
 
+    __slots__ = ('name', 'type', 'doc', 'name_set')
+
     def __init__(self, doc):
-        match = re.search("^ +([^ ]+)[ ]+([^ ]+)[ ]+(.+)", doc)
+        match = ARGUMENT_DOC_REX.search(doc)
         if match is not None:
             self.name = match.group(1)
             if self.name.startswith('*'):  # Easier than getting the regex to behave...
                 self.name = self.name.replace('*', '')
             self.type = match.group(2)
             self.doc = match.group(3)
+            # Several arguments can be documented together, as in "x,y,z".
+            self.name_set = frozenset(n.strip() for n in self.name.split(','))
         else:
             self.name = None
             self.type = None
             self.doc = None
+            self.name_set = frozenset()
 
     def __repr__(self):
         return f"    {self.name:15} {self.type:15} {self.doc}"
@@ -163,6 +233,9 @@ class ArgumentDoc:
 
 class Variable:
     """Properties shared by Argument and Return."""
+
+    __slots__ = ()
+
     @property
     def npy_type(self):
         """Predefined type used by numpy ufuncs to indicate a given ctype.
@@ -257,41 +330,29 @@ class Variable:
 
 class Argument(Variable):
 
+    __slots__ = ('definition', 'doc', 'ctype', 'is_ptr', 'name', 'shape',
+                 '_inout_state')
+
     def __init__(self, definition, doc):
         self.definition = definition
         self.doc = doc
-        self.__inout_state = None
-        self.ctype, ptr_name_arr = definition.strip().rsplit(" ", 1)
-        if "*" == ptr_name_arr[0]:
-            self.is_ptr = True
-            name_arr = ptr_name_arr[1:]
-        else:
-            self.is_ptr = False
-            name_arr = ptr_name_arr
-        if "[]" in ptr_name_arr:
-            self.is_ptr = True
-            name_arr = name_arr[:-2]
-        if "[" in name_arr:
-            self.name, arr = name_arr.split("[", 1)
-            self.shape = tuple([int(size) for size in arr[:-1].split("][")])
-        else:
-            self.name = name_arr
-            self.shape = ()
+        self._inout_state = None
+        self.ctype, self.name, self.shape, self.is_ptr = (
+            parse_argument_definition(definition))
 
     @property
     def inout_state(self):
-        if self.__inout_state is None:
-            self.__inout_state = ''
-            for i in self.doc.input:
-                if self.name in i.name.split(','):
-                    self.__inout_state = 'in'
-            for o in self.doc.output:
-                if self.name in o.name.split(','):
-                    if self.__inout_state == 'in':
-                        self.__inout_state = 'inout'
-                    else:
-                        self.__inout_state = 'out'
-        return self.__inout_state
+        if self._inout_state is None:
+            if self.name in self.doc.input_names:
+                if self.name in self.doc.output_names:
+                    self._inout_state = 'inout'
+                else:
+                    self._inout_state = 'in'
+            elif self.name in self.doc.output_names:
+                self._inout_state = 'out'
+            else:
+                self._inout_state = ''
+        return self._inout_state
 
     @property
     def name_for_call(self):
@@ -347,6 +408,8 @@ class ReturnDoc:
 
 class Return(Variable):
 
+    __slots__ = ('name', 'inout_state', 'ctype', 'shape', 'doc')
+
     def __init__(self, ctype, doc):
         self.name = 'c_retval'
         self.inout_state = 'stat' if ctype == 'int' else 'ret'
@@ -377,45 +440,65 @@ class Function:
     match_line : str, optional
         If given, searching of the source file will skip until it finds
         a line matching this string, and start from there.
+    precomputed : tuple of str, optional
+        The function definition and its documentation comment, if these
+        were already extracted from the source (e.g., using
+        `find_definitions`).  If given, the source file is not read.
     """
 
-    def __init__(self, name, source_path, match_line=None):
+    __slots__ = ('name', 'pyname', 'filename', 'filepath', 'cfunc', 'doc',
+                 'args', 'ret', 'arg_inout', '_args_by_inout', '_derived')
+
+    def __init__(self, name, source_path, match_line=None, precomputed=None):
         self.name = name
-        self.pyname = name.split('era')[-1].lower()
+        self.pyname = name.split('era', 1)[-1].lower()
         self.filename = self.pyname+".c"
         if os.path.isdir(source_path):
             self.filepath = os.path.join(os.path.normpath(source_path), self.filename)
         else:
             self.filepath = source_path
 
-        with open(self.filepath) as f:
-            if match_line:
-                line = f.readline()
-                while line != '':
-                    if line.startswith(match_line):
-                        filecontents = '\n' + line + f.read()
-                        break
-                    line = f.readline()
-                else:
-                    msg = ('Could not find the match_line "{0}" in '
-                           'the source file "{1}"')
-                    raise ValueError(msg.format(match_line, self.filepath))
-            else:
-                filecontents = f.read()
-
-        pattern = fr"\n([^\n]+{name} ?\([^)]+\)).+?(/\*.+?\*/)"
-        p = re.compile(pattern, flags=re.DOTALL | re.MULTILINE)
+        if precomputed is None:
+            precomputed = self._read_definition(match_line)
 
-        search = p.search(filecontents)
-        self.cfunc = " ".join(search.group(1).split())
-        self.doc = FunctionDoc(search.group(2))
+        cfunc, doc = precomputed
+        self.cfunc = " ".join(cfunc.split())
+        self.doc = FunctionDoc(doc)
 
         self.args = []
-        for arg in re.search(r"\(([^)]+)\)", self.cfunc).group(1).split(', '):
+        for arg in ARGUMENTS_REX.search(self.cfunc).group(1).split(', '):
             self.args.append(Argument(arg, self.doc))
-        self.ret = re.search(f"^(.*){name}", self.cfunc).group(1).strip()
+        self.ret = self.cfunc.rpartition(name)[0].strip()
         if self.ret != 'void':
             self.args.append(Return(self.ret, self.doc))
+        self._init_arg_caches()
+
+    def _init_arg_caches(self):
+        """Set up the argument lookups used by the templates, once args is set."""
+        # Inout states of the arguments, in the same order as args.
+        self.arg_inout = tuple(arg.inout_state for arg in self.args)
+        self._args_by_inout = {}
+        self._derived = {}
+
+    def _read_definition(self, match_line=None):
+        """Get the function definition and documentation from the source file."""
+        filecontents = read_source(self.filepath)
+
+        index = 0
+        if match_line and not filecontents.startswith(match_line):
+            # Start at the first line that starts with match_line.
+            index = filecontents.find('\n' + match_line)
+            if index < 0:
+                msg = ('Could not find the match_line "{0}" in '
+                       'the source file "{1}"')
+                raise ValueError(msg.format(match_line, self.filepath))
+            index += 1
+
+        definition = find_definitions(filecontents, index).get(self.name)
+        if definition is None:
+            raise ValueError('Could not find the definition of {0} in the '
+                             'source file "{1}"'.format(self.name, self.filepath))
+        return definition
 
     def args_by_inout(self, inout_filter, prop=None, join=None):
         """
@@ -432,20 +515,37 @@ class Function:
           * "stat" : the return value of the C function if it is a status code
 
         It can also be a "|"-separated string giving inout states to OR
-        together.
+        together, or a set of inout states.
+
+        Since the templates use the same filters many times, the selected
+        arguments are cached for each filter.
         """
-        result = []
-        for arg in self.args:
-            if arg.inout_state in inout_filter.split('|'):
-                if prop is None:
-                    result.append(arg)
-                else:
-                    result.append(getattr(arg, prop))
+        if not isinstance(inout_filter, str):
+            # Plain sets cannot be used as cache keys.
+            inout_filter = frozenset(inout_filter)
+        args = self._args_by_inout.get(inout_filter)
+        if args is None:
+            if isinstance(inout_filter, str):
+                filter_set = INOUT_FILTER_SETS.get(inout_filter)
+                if filter_set is None:
+                    filter_set = INOUT_FILTER_SETS[inout_filter] = frozenset(
+                        inout_filter.split('|'))
+            else:
+                filter_set = inout_filter
+            args = self._args_by_inout[inout_filter] = [
+                arg for arg, state in zip(self.args, self.arg_inout)
+                if state in filter_set]
+        if prop is None:
+            result = list(args)
+        else:
+            result = [getattr(arg, prop) for arg in args]
         if join is not None:
             return join.join(result)
         else:
             return result
 
+    # The properties below are used many times by the templates for each
+    # function, so they are calculated only once, on first use.
     @property
     def user_dtype(self):
         """The non-standard dtype, if any, needed by this function's ufunc.
@@ -454,6 +554,11 @@ class Function:
         we give preference to LDBODY, since that also decides that the ufunc
         should be a generalized ufunc.
         """
+        if 'user_dtype' not in self._derived:
+            self._derived['user_dtype'] = self._get_user_dtype()
+        return self._derived['user_dtype']
+
+    def _get_user_dtype(self):
         user_dtype = None
         for arg in self.args_by_inout('in|inout|out'):
             if arg.ctype == 'eraLDBODY':
@@ -467,6 +572,11 @@ class Function:
     @property
     def signature(self):
         """Possible signature, if this function should be a gufunc."""
+        if 'signature' not in self._derived:
+            self._derived['signature'] = self._get_signature()
+        return self._derived['signature']
+
+    def _get_signature(self):
         if all(arg.signature_shape == '()'
                for arg in self.args_by_inout('in|inout|out')):
             return None
@@ -478,6 +588,11 @@ class Function:
 
     @property
     def python_call(self):
+        if 'python_call' not in self._derived:
+            self._derived['python_call'] = self._get_python_call()
+        return self._derived['python_call']
+
+    def _get_python_call(self):
         out = ', '.join([arg.name for arg in self.args_by_inout('inout|out|stat|ret')])
         args = ', '.join([arg.name for arg in self.args_by_inout('in|inout')])
         result = '{out} = {func}({args})'.format(out=out,
@@ -498,6 +613,95 @@ class Function:
                 f"filename='{self.filename}', filepath='{self.filepath}')")
 
 
+def find_definitions(filecontents, start=0):
+    """Find all ERFA function definitions in the contents of a C source file.
+
+    A definition is taken to be a line starting with the return type and
+    the function name, followed by the arguments and, directly after those,
+    the documentation comment.  Lines with an assignment or another
+    statement (``=``, ``;`` or ``,``) before the name are taken to be calls.
+    The file is scanned once, from comment to comment, using only string
+    searches.  If ``start`` is given, the scan starts at that offset, which
+    should be the start of a line.
+
+    Returns
+    -------
+    definitions : dict
+        With function names as keys, and tuples of the definition and its
+        documentation comment as values, suitable for passing on to
+        `Function` (as its ``precomputed`` argument).
+    """
+    definitions = {}
+    comment_start = filecontents.find('/*', start)
+    while comment_start >= 0:
+        comment_end = filecontents.find('*/', comment_start + 2)
+        if comment_end < 0:
+            break
+        comment_end += 2
+        # Everything before the comment, up to whitespace, should be the
+        # closing parenthesis of the arguments.
+        args_end = comment_start - 1
+        while args_end >= start and filecontents[args_end].isspace():
+            args_end -= 1
+        if args_end >= start and filecontents[args_end] == ')':
+            args_start = filecontents.rfind('(', start, args_end)
+            line_start = max(filecontents.rfind('\n', start, args_start) + 1,
+                             start)
+            head = filecontents[line_start:args_start]
+            name = head.rstrip().rpartition(' ')[2].lstrip('*')
+            if (head and (head[0].isalnum() or head[0] == '_')
+                    and name.startswith('era') and name.isidentifier()
+                    and not any(c in head for c in '=;,')
+                    and filecontents.find(')', args_start, args_end) < 0):
+                definitions.setdefault(
+                    name, (filecontents[line_start:args_end+1],
+                           filecontents[comment_start:comment_end]))
+        comment_start = filecontents.find('/*', comment_end)
+    return definitions
+
+
+def _map_file(f):
+    """Read-only memory map of an open file (None for an empty file)."""
+    if os.fstat(f.fileno()).st_size == 0:
+        return None
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_source(path):
+    """Read the contents of a source or header file.
+
+    The file is memory mapped and decoded straight from the mapped buffer,
+    without first copying it into a python bytes object.  Line endings are
+    normalized as they would be in text mode.
+    """
+    with open(path, 'rb') as f:
+        mm = _map_file(f)
+        if mm is None:
+            return ''
+        with mm:
+            contents = str(mm, 'utf-8')
+    if '\r' in contents:
+        contents = contents.replace('\r\n', '\n').replace('\r', '\n')
+    return contents
+
+
+def source_hash(paths):
+    """SHA-256 hex digest of the names and contents of the given files."""
+    sha = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            # Separate the fields, so that names and contents cannot run
+            # into each other.
+            name = os.path.basename(path).encode()
+            size = os.fstat(f.fileno()).st_size
+            sha.update(b'%s\0%d\0' % (name, size))
+            mm = _map_file(f)
+            if mm is not None:
+                with mm:
+                    sha.update(mm)
+    return sha.hexdigest()
+
+
 class Constant:
 
     def __init__(self, name, value, doc):
@@ -523,7 +727,7 @@ class ExtraFunction(Function):
 
     def __init__(self, cname, prototype, pathfordoc):
         self.name = cname
-        self.pyname = cname.split('era')[-1].lower()
+        self.pyname = cname.split('era', 1)[-1].lower()
         self.filepath, self.filename = os.path.split(pathfordoc)
 
         self.prototype = prototype.strip()
@@ -563,6 +767,7 @@ class ExtraFunction(Function):
                             self.prototype).group(1).strip()
         if self.ret != 'void':
             self.args.append(Return(self.ret, self.doc))
+        self._init_arg_caches()
 
     def __repr__(self):
         r = super().__repr__()
@@ -571,16 +776,34 @@ class ExtraFunction(Function):
         return r
 
 
+def find_test_functions(t_erfa_c):
+    """Find the bodies of all test functions in the contents of t_erfa_c.c.
+
+    Returns
+    -------
+    test_functions : dict
+        With the (python) names of the ERFA functions tested as keys, and
+        the bodies of the corresponding test functions as values.
+    """
+    test_functions = {}
+    for name, body in TEST_FUNCTION_REX.findall(t_erfa_c):
+        test_functions.setdefault(name, body)
+    return test_functions
+
+
 class TestFunction:
-    """Function holding information about a test in t_erfa_c.c"""
+    """Function holding information about a test in t_erfa_c.c
+
+    The ``t_erfa_c`` argument can be the contents of t_erfa_c.c or,
+    to avoid searching the file anew for every test, the dict of test
+    function bodies found in it by `find_test_functions`.
+    """
     def __init__(self, name, t_erfa_c, nin, ninout, nout):
         self.name = name
-        # Get lines that test the given erfa function: capture everything
-        # between a line starting with '{' after the test function definition
-        # and the first line starting with '}' or ' }'.
-        pattern = fr"\nstatic void t_{name}\(" + r".+?(^\{.+?^\s?\})"
-        search = re.search(pattern, t_erfa_c, flags=re.DOTALL | re.MULTILINE)
-        self.lines = search.group(1).split('\n')
+        # Get lines that test the given erfa function.
+        if isinstance(t_erfa_c, str):
+            t_erfa_c = find_test_functions(t_erfa_c)
+        self.lines = t_erfa_c[name].split('\n')
         # Number of input, inplace, and output arguments.
         self.nin = nin
         self.ninout = ninout
@@ -790,8 +1013,31 @@ class TestFunction:
         return out
 
 
-def main(srcdir=DEFAULT_ERFA_LOC, templateloc=DEFAULT_TEMPLATE_LOC, verbose=True):
-    from jinja2 import Environment, FileSystemLoader
+def main(srcdir=DEFAULT_ERFA_LOC, templateloc=DEFAULT_TEMPLATE_LOC, verbose=True,
+         skip_if_unchanged=False):
+    """Generate the ERFA ufunc C and python code, and the ufunc tests.
+
+    Parameters
+    ----------
+    srcdir : str
+        Directory with the ERFA source and header files, or the path to a
+        single erfa.c file (in the same directory as erfa.h).
+    templateloc : str
+        Directory with the templates; the files are generated next to them.
+    verbose : bool
+        Whether to print progress while generating.
+    skip_if_unchanged : bool
+        If `True`, do not regenerate the files if none of the inputs
+        (sources, templates, or this generator itself) changed since they
+        were last generated.  The existing files are just touched.
+
+    Returns
+    -------
+    erfa_c, erfa_py, funcs, test_py, test_funcs : tuple or None
+        The generated code and the functions and tests they were generated
+        from, or `None` if generation was skipped.
+    """
+    from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 
     outfn = 'core.py'
     ufuncfn = 'ufunc.c'
@@ -804,8 +1050,58 @@ def main(srcdir=DEFAULT_ERFA_LOC, templateloc=DEFAULT_TEMPLATE_LOC, verbose=True
         def print_(*args, **kwargs):
             return None
 
-    # Prepare the jinja2 templating environment
-    env = Environment(loader=FileSystemLoader(templateloc))
+    # Locate the ERFA header and source files.
+    if os.path.isdir(srcdir):
+        erfahfn = os.path.join(srcdir, 'erfa.h')
+        erfamhfn = os.path.join(srcdir, 'erfam.h')
+        t_erfa_c_fn = os.path.join(srcdir, 't_erfa_c.c')
+        multifilserc = True
+    else:
+        erfahfn = os.path.join(os.path.split(srcdir)[0], 'erfa.h')
+        erfamhfn = os.path.join(os.path.split(srcdir)[0], 'erfam.h')
+        t_erfa_c_fn = os.path.join(os.path.split(srcdir)[0], 't_erfa_c.c')
+        multifilserc = False
+
+    # If requested, skip regeneration if none of the inputs (sources,
+    # templates, or this generator itself) changed since the files were
+    # last generated.
+    outfiles = [os.path.join(templateloc, outfn),
+                os.path.join(templateloc, ufuncfn),
+                os.path.join(templateloc, testdir, testfn)]
+    stampfn = os.path.join(templateloc, outfn + '.stamp')
+    if multifilserc:
+        c_files = sorted(os.path.join(srcdir, fn) for fn in os.listdir(srcdir)
+                         if fn.endswith('.c') and not fn.startswith('t_'))
+    else:
+        c_files = [srcdir]
+    templates = [os.path.join(templateloc, outfn + '.templ'),
+                 os.path.join(templateloc, ufuncfn + '.templ'),
+                 os.path.join(templateloc, testdir, testfn + '.templ')]
+    inputs_hash = source_hash([__file__, erfahfn, erfamhfn, t_erfa_c_fn]
+                              + c_files + templates)
+    if skip_if_unchanged and all(os.path.exists(fn) for fn in outfiles + [stampfn]):
+        with open(stampfn) as f:
+            up_to_date = f.read().strip() == inputs_hash
+        if up_to_date:
+            # Touch the outputs, so that make-like checks against the inputs
+            # (such as the one in setup.py) do not keep rerunning us.
+            for fn in outfiles + [stampfn]:
+                os.utime(fn)
+            print_("Generated files are up to date")
+            return None
+
+    # Prepare the jinja2 templating environment.  Compiled templates are
+    # kept in a bytecode cache (by default in a user-specific directory
+    # in the system temporary directory), so that regenerating the files
+    # does not require parsing and compiling the templates every time.
+    # The cache is only a speed-up: if jinja2 cannot find a safe directory
+    # for it, just compile the templates as usual.
+    try:
+        bytecode_cache = FileSystemBytecodeCache()
+    except (RuntimeError, OSError):
+        bytecode_cache = None
+    env_kwargs = dict(bytecode_cache=bytecode_cache)
+    env = Environment(loader=FileSystemLoader(templateloc), **env_kwargs)
 
     def prefix(a_list, pre):
         return [pre+f'{an_element}' for an_element in a_list]
@@ -823,39 +1119,39 @@ def main(srcdir=DEFAULT_ERFA_LOC, templateloc=DEFAULT_TEMPLATE_LOC, verbose=True
     erfa_py_in = env.get_template(outfn + '.templ')
 
     # Prepare the jinja2 test templating environment
-    env2 = Environment(loader=FileSystemLoader(os.path.join(templateloc, testdir)))
+    env2 = Environment(loader=FileSystemLoader(os.path.join(templateloc, testdir)),
+                       **env_kwargs)
 
     test_py_in = env2.get_template(testfn + '.templ')
 
     # Extract all the ERFA function names from erfa.h
-    if os.path.isdir(srcdir):
-        erfahfn = os.path.join(srcdir, 'erfa.h')
-        t_erfa_c_fn = os.path.join(srcdir, 't_erfa_c.c')
-        multifilserc = True
-    else:
-        erfahfn = os.path.join(os.path.split(srcdir)[0], 'erfa.h')
-        t_erfa_c_fn = os.path.join(os.path.split(srcdir)[0], 't_erfa_c.c')
-        multifilserc = False
+    erfa_h = read_source(erfahfn)
+    print_("read erfa header")
 
-    with open(erfahfn, "r") as f:
-        erfa_h = f.read()
-        print_("read erfa header")
+    t_erfa_c = find_test_functions(read_source(t_erfa_c_fn))
+    print_("read C tests")
 
-    with open(t_erfa_c_fn, "r") as f:
-        t_erfa_c = f.read()
-        print_("read C tests")
+    if not multifilserc:
+        # Find all definitions in one go, rather than searching the
+        # (large) single source file anew for every function.
+        definitions = find_definitions(read_source(srcdir))
+        print_("read C source")
 
     funcs = OrderedDict()
-    section_subsection_functions = re.findall(
-        r'/\* (\w*)/(\w*) \*/\n(.*?)\n\n', erfa_h,
-        flags=re.DOTALL | re.MULTILINE)
+    section_subsection_functions = SECTION_REX.findall(erfa_h)
     for section, subsection, functions in section_subsection_functions:
         print_(f"{section}.{subsection}")
 
         if True:
 
-            func_names = re.findall(r' (\w+)\(.*?\);', functions,
-                                    flags=re.DOTALL)
+            func_names = FUNCTION_NAME_REX.findall(functions)
+            if not multifilserc:
+                # Index the start of each declaration (up to and including
+                # the function name), with whitespace normalized since the
+                # header and C files don't necessarily have to match in
+                # line-breaking or whitespace.
+                declarations = {match.group(2): " ".join(match.group(1).split())
+                                for match in DECLARATION_REX.finditer(functions)}
             for name in func_names:
                 print_(f"{section}.{subsection}.{name}...")
                 if multifilserc:
@@ -864,25 +1160,18 @@ def main(srcdir=DEFAULT_ERFA_LOC, templateloc=DEFAULT_TEMPLATE_LOC, verbose=True
                             templateloc or '.')
                     funcs[name] = Function(name, cdir)
                 else:
-                    # Have to tell it to look for a declaration matching
-                    # the start of the header declaration, otherwise it
-                    # might find a *call* of the function instead of the
-                    # definition
-                    for line in functions.split(r'\n'):
-                        if name in line:
-                            # [:-1] is to remove trailing semicolon, and
-                            # splitting on '(' is because the header and
-                            # C files don't necessarily have to match
-                            # argument names and line-breaking or
-                            # whitespace
-                            match_line = line[:-1].split('(')[0]
-                            funcs[name] = Function(name, cdir, match_line)
-                            break
-                    else:
-                        raise ValueError("A name for a C file wasn't "
-                                         "found in the string that "
-                                         "spawned it.  This should be "
-                                         "impossible!")
+                    # The definitions were already extracted from the
+                    # source file; check that what was found matches the
+                    # start of the header declaration, i.e., that it is
+                    # the definition and not a *call* of the function.
+                    if (name not in definitions or name not in declarations
+                            or not " ".join(definitions[name][0].split())
+                            .startswith(declarations[name])):
+                        raise ValueError('Could not find the definition of '
+                                         '{0} in the source file "{1}"'
+                                         .format(name, srcdir))
+                    funcs[name] = Function(name, srcdir,
+                                           precomputed=definitions[name])
 
     test_funcs = [TestFunction.from_function(funcs[name], t_erfa_c)
                   for name in sorted(funcs.keys())]
@@ -890,15 +1179,12 @@ def main(srcdir=DEFAULT_ERFA_LOC, templateloc=DEFAULT_TEMPLATE_LOC, verbose=True
     funcs = funcs.values()
 
     # Extract all the ERFA constants from erfam.h
-    erfamhfn = os.path.join(srcdir, 'erfam.h')
-    with open(erfamhfn, 'r') as f:
-        erfa_m_h = f.read()
+    erfa_m_h = read_source(erfamhfn)
     constants = []
     for chunk in erfa_m_h.split("\n\n"):
-        result = re.findall(r"#define (ERFA_\w+?) (.+?)$", chunk,
-                            flags=re.DOTALL | re.MULTILINE)
+        result = CONSTANT_REX.findall(chunk)
         if result:
-            doc = re.findall(r"/\* (.+?) \*/\n", chunk, flags=re.DOTALL)
+            doc = CONSTANT_DOC_REX.findall(chunk)
             for (name, value) in result:
                 constants.append(Constant(name, value, doc))
 
@@ -927,6 +1213,8 @@ def main(srcdir=DEFAULT_ERFA_LOC, templateloc=DEFAULT_TEMPLATE_LOC, verbose=True
             f.write(erfa_c)
         with open(os.path.join(templateloc, testdir, testfn), "w") as f:
             f.write(test_py)
+        with open(stampfn, "w") as f:
+            f.write(inputs_hash + "\n")
 
     print_("Done!")
 
@@ -948,6 +1236,10 @@ if __name__ == '__main__':
                          '"ufunc.c.templ templates can be found.')
     ap.add_argument('-q', '--quiet', action='store_false', dest='verbose',
                     help='Suppress output normally printed to stdout.')
+    ap.add_argument('-f', '--force', action='store_true',
+                    help='Regenerate the files even if none of the sources, '
+                         'templates, or the generator changed.')
 
     args = ap.parse_args()
-    main(args.srcdir, args.template_loc, args.verbose)
+    main(args.srcdir, args.template_loc, args.verbose,
+         skip_if_unchanged=not args.force)